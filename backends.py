@@ -0,0 +1,266 @@
+import datetime
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+
+# ========= BACKENDS DE CÁLCULO =========
+# O pivot por Instituição e as estatísticas gerais passam por um backend.
+# O padrão é o pandas (implementação original); o DuckDB é opcional
+# (pip install duckdb, já listado no requirements.txt) e roda o groupby/janelas
+# em paralelo, devolvendo exatamente os mesmos DataFrames.
+# O postgres guarda as transações de cada usuário no banco (db.py) e calcula
+# tudo lá, trazendo só o resultado agregado.
+# Escolha com a variável de ambiente FINANCE_BACKEND=pandas|duckdb|postgres.
+
+DEFAULT_BACKEND = os.environ.get("FINANCE_BACKEND", "pandas")
+
+JANELAS = (6, 12, 24)
+
+
+def _sql_stats(por_data, divisao_segura=False):
+    # mesmas colunas do PandasBackend.calc_general_stats, em funções de janela.
+    # `por_data` é uma consulta com as colunas "Data" e "Valor" (total por data).
+    # O Postgres dá erro ao dividir por zero; com divisao_segura a divisão
+    # devolve ±Infinity/NaN como o pandas.
+    def div(num, den):
+        if not divisao_segura:
+            return f"{num} / {den}"
+        return f"""CASE WHEN {den} = 0
+                   THEN CAST(CASE WHEN {num} > 0 THEN 'Infinity' WHEN {num} < 0 THEN '-Infinity' ELSE 'NaN' END AS DOUBLE PRECISION)
+                   ELSE {num} / {den} END"""
+
+    medias = ",\n".join(
+        f"""CASE WHEN count(dif) OVER w{n} = {n} THEN avg(dif) OVER w{n} END AS "Avg {n}M Diferença\""""
+        for n in JANELAS
+    )
+    evolucoes = ",\n".join(
+        f"""CASE WHEN row_number() OVER w >= {n}
+                 THEN {div('"Valor"', f'lag("Valor", {n - 1}) OVER w')} - 1 END AS "Evolução {n}M Relativa\""""
+        for n in JANELAS
+    )
+    janelas = ",\n".join(f"w{n} AS (ORDER BY \"Data\" ROWS BETWEEN {n - 1} PRECEDING AND CURRENT ROW)" for n in JANELAS)
+    return f"""
+        WITH por_data AS ({por_data}),
+        com_lag AS (
+            SELECT "Data", "Valor",
+                   lag("Valor") OVER (ORDER BY "Data") AS lag_1,
+                   "Valor" - lag("Valor") OVER (ORDER BY "Data") AS dif
+            FROM por_data
+        )
+        SELECT "Data", "Valor",
+               dif AS "Diferença Mensal",
+               {medias},
+               {div('"Valor"', "lag_1")} - 1 AS "Diferença Mensal Rel.",
+               {evolucoes}
+        FROM com_lag
+        WINDOW w AS (ORDER BY "Data"), {janelas}
+        ORDER BY "Data"
+    """
+
+
+class PandasBackend:
+    nome = "pandas"
+
+    def pivot_instituicao(self, df):
+        return df.pivot_table(index="Data", columns="Instituição", values="Valor")
+
+    def calc_general_stats(self, df):
+        df_data = df.groupby(by="Data")[["Valor"]].sum()
+        df_data["lag_1"] = df_data["Valor"].shift(1)
+        df_data["Diferença Mensal"] = df_data["Valor"] - df_data["lag_1"]
+
+        df_data["Avg 6M Diferença"] = df_data["Diferença Mensal"].rolling(6).mean()
+        df_data["Avg 12M Diferença"] = df_data["Diferença Mensal"].rolling(12).mean()
+        df_data["Avg 24M Diferença"] = df_data["Diferença Mensal"].rolling(24).mean()
+
+        df_data["Diferença Mensal Rel."] = df_data["Valor"] / df_data["lag_1"] - 1
+        df_data["Evolução 6M Relativa"] = df_data["Valor"].rolling(6).apply(lambda x: x.iloc[-1] / x.iloc[0] - 1)
+        df_data["Evolução 12M Relativa"] = df_data["Valor"].rolling(12).apply(lambda x: x.iloc[-1] / x.iloc[0] - 1)
+        df_data["Evolução 24M Relativa"] = df_data["Valor"].rolling(24).apply(lambda x: x.iloc[-1] / x.iloc[0] - 1)
+
+        df_data = df_data.drop(columns=["lag_1"])
+        return df_data
+
+
+class DuckDBBackend:
+    nome = "duckdb"
+
+    def __init__(self):
+        import duckdb  # dependência opcional
+        import pyarrow as pa
+
+        self._duckdb = duckdb
+        self._pa = pa
+        # (weakref do DataFrame, colunas convertidas): o pivot e as estatísticas
+        # do mesmo upload convertem a "Data" uma vez só
+        self._ultima = None
+
+    def _tabela(self, df):
+        # O app guarda "Data" como datetime.date (dtype object), que o DuckDB lê
+        # objeto a objeto. Convertida pelo Arrow para datetime64 a leitura é
+        # vetorizada; as outras colunas entram sem cópia (sem df[[...]]).
+        if self._ultima is not None and self._ultima[0]() is df:
+            return self._ultima[1]
+        datas = self._pa.array(df["Data"], from_pandas=True).cast(self._pa.timestamp("ns")).to_pandas()
+        tabela = pd.DataFrame(
+            {"Data": datas.set_axis(df.index), "Instituição": df["Instituição"], "Valor": df["Valor"]},
+            copy=False,
+        )
+        self._ultima = (weakref.ref(df), tabela)
+        return tabela
+
+    def _query(self, sql, df):
+        # uma conexão em memória por chamada: seguro entre sessões/threads
+        with self._duckdb.connect() as conn:
+            conn.register("transacoes", self._tabela(df))
+            return conn.execute(sql).df()
+
+    @staticmethod
+    def _indice_datas(frame):
+        # o DuckDB devolve as datas como datetime64; o app trabalha com datetime.date.
+        # Só o índice já agregado é convertido (uma vez por data).
+        frame.index = pd.Index(pd.DatetimeIndex(frame.index).date, name="Data")
+        return frame
+
+    def pivot_instituicao(self, df):
+        # média por Data x Instituição no DuckDB; só o resultado agregado volta ao pandas
+        long = self._query("""
+            SELECT "Data", "Instituição", avg(CAST("Valor" AS DOUBLE)) AS "Valor"
+            FROM transacoes
+            WHERE "Data" IS NOT NULL AND "Instituição" IS NOT NULL AND "Valor" IS NOT NULL
+            GROUP BY 1, 2
+        """, df)
+        pivot = long.pivot(index="Data", columns="Instituição", values="Valor").sort_index()
+        return self._indice_datas(pivot.sort_index(axis=1))
+
+    def calc_general_stats(self, df):
+        stats = self._query(_sql_stats("""
+            SELECT "Data", coalesce(sum(CAST("Valor" AS DOUBLE)), 0) AS "Valor"
+            FROM transacoes
+            WHERE "Data" IS NOT NULL
+            GROUP BY 1
+        """), df)
+        return self._indice_datas(stats.set_index("Data"))
+
+
+class PostgresBackend:
+    nome = "postgres"
+
+    # cache (usuário, consulta) -> resultado, compartilhado entre as sessões do processo
+    MAX_CACHE = 512
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, username):
+        if not username:
+            raise ValueError("O backend postgres precisa de um usuário logado.")
+        # import tardio: os outros backends não precisam de conexão com o banco
+        import db
+
+        db.ensure_transactions_table()
+        self._db = db
+        self.username = username
+
+    def salvar(self, df):
+        return self._db.salvar_transacoes(self.username, df)
+
+    def versao(self):
+        # muda a cada gravação do usuário (inclusive de outras sessões)
+        with self._db.snapshot() as conn, conn.begin():
+            return self._db.estado_transacoes(self.username, conn)["versao"]
+
+    def _buscar(self, chave, sql, montar):
+        # Cada gravação em transacoes_estado sobe a `versao`; uploads que reescrevem
+        # o histórico também sobem a `versao_reescrita`. Se nada foi reescrito desde
+        # o resultado em cache, só as datas novas são buscadas e somadas a ele.
+        with self._db.snapshot() as conn, conn.begin():
+            estado = self._db.estado_transacoes(self.username, conn)
+            with self._lock:
+                anterior = self._cache.get((self.username, chave))
+            if anterior is not None:
+                if estado["versao"] == anterior["versao"]:
+                    return anterior["frame"]
+                if estado["versao_reescrita"] > anterior["versao"]:
+                    anterior = None
+
+            desde = anterior["ultima_data"] if anterior is not None else datetime.date.min
+            ate = estado["ultima_data"] or datetime.date.min
+            novos = montar(self._db.query_dataframe(sql, {"u": self.username, "desde": desde, "ate": ate}, conn))
+        if anterior is None:
+            frame = novos
+        elif novos.empty:
+            frame = anterior["frame"]
+        else:
+            frame = pd.concat([anterior["frame"], novos])
+
+        with self._lock:
+            self._cache[(self.username, chave)] = {
+                "versao": estado["versao"],
+                "ultima_data": estado["ultima_data"],
+                "frame": frame,
+            }
+            self._cache.move_to_end((self.username, chave))
+            while len(self._cache) > self.MAX_CACHE:
+                self._cache.popitem(last=False)
+        return frame
+
+    def pivot_instituicao(self, df):
+        def montar(long):
+            pivot = long.astype({"Valor": float}).pivot(index="Data", columns="Instituição", values="Valor")
+            return pivot.sort_index(axis=1)
+
+        frame = self._buscar("pivot", """
+            SELECT data AS "Data", instituicao AS "Instituição", avg(valor) AS "Valor"
+            FROM transacoes
+            WHERE username=:u AND data > :desde AND data <= :ate AND valor IS NOT NULL
+            GROUP BY 1, 2
+        """, montar)
+        return frame.sort_index(axis=1)
+
+    def calc_general_stats(self, df):
+        # as janelas usam todo o histórico no banco; só as linhas novas voltam
+        stats = _sql_stats("""
+            SELECT data AS "Data", coalesce(sum(valor), 0) AS "Valor"
+            FROM transacoes
+            WHERE username=:u AND data <= :ate
+            GROUP BY 1
+        """, divisao_segura=True)
+        return self._buscar("stats", f"""
+            SELECT * FROM ({stats}) s
+            WHERE "Data" > :desde
+            ORDER BY "Data"
+        """, lambda novos: novos.set_index("Data").astype(float))
+
+
+BACKENDS = {
+    PandasBackend.nome: PandasBackend,
+    DuckDBBackend.nome: DuckDBBackend,
+    PostgresBackend.nome: PostgresBackend,
+}
+
+
+def get_backend(nome=None, username=None):
+    nome = nome or DEFAULT_BACKEND
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: {nome} (opções: {', '.join(BACKENDS)})")
+    if nome == PostgresBackend.nome:
+        return PostgresBackend(username)
+    return BACKENDS[nome]()
+
+
+if __name__ == "__main__":
+    # uso: python backends.py arquivo.csv [backend]
+    # mostra o tempo do pandas e do backend (a paridade fica em test_backends.py)
+    import sys
+    import time
+
+    df = pd.read_csv(sys.argv[1])
+    df["Data"] = pd.to_datetime(df["Data"], format="%d/%m/%Y").dt.date
+    for backend in (get_backend("pandas"), get_backend(*sys.argv[2:3] or ["duckdb"])):
+        for metodo in ("pivot_instituicao", "calc_general_stats"):
+            inicio = time.perf_counter()
+            getattr(backend, metodo)(df)
+            print(f"{backend.nome:8s} {metodo:20s} {time.perf_counter() - inicio:.3f}s")
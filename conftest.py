@@ -0,0 +1,68 @@
+import datetime
+import os
+import uuid
+
+import pandas as pd
+import pytest
+
+from backends import get_backend
+
+# os testes com Postgres rodam só com um banco de teste explícito: ENGINE_URL=postgresql+psycopg2://...
+POSTGRES = os.environ.get("ENGINE_URL", "").startswith("postgresql")
+
+
+def _transacoes(n_datas, instituicoes=("Nubank", "Itaú", "XP"), valor=lambda d, i: 1000.0 * (d + 1) + 10 * i):
+    linhas = []
+    for d in range(n_datas):
+        data = datetime.date(2020 + d // 12, d % 12 + 1, 1)
+        for i, inst in enumerate(instituicoes):
+            linhas.append({"Data": data, "Instituição": inst, "Valor": valor(d, i)})
+    return pd.DataFrame(linhas)
+
+
+@pytest.fixture
+def transacoes():
+    # fábrica de uploads sintéticos: uma linha por (data mensal, instituição)
+    return _transacoes
+
+
+@pytest.fixture
+def usuario():
+    if not POSTGRES:
+        pytest.skip("ENGINE_URL não aponta para um Postgres de teste")
+    import db
+    from sqlalchemy import text
+
+    db.ensure_users_table()
+    username = f"teste_{uuid.uuid4().hex[:8]}"
+    db.upsert_user_to_db(username, f"{username}@example.com", "Teste", "Postgres", "hash")
+    yield username
+    with db.engine.begin() as conn:
+        conn.execute(text("DELETE FROM users WHERE username=:u"), {"u": username})
+
+
+@pytest.fixture(params=["duckdb", "postgres"])
+def backend(request):
+    # backends alternativos ao pandas; os que não estão disponíveis são pulados
+    if request.param == "postgres":
+        return get_backend("postgres", username=request.getfixturevalue("usuario"))
+    pytest.importorskip("duckdb")
+    return get_backend(request.param)
+
+
+@pytest.fixture
+def comparar(backend):
+    # confere se o backend gera os mesmos DataFrames que o pandas
+    def _comparar(df, rtol=1e-9):
+        if backend.nome == "postgres":
+            # o postgres calcula sobre o que está salvo no banco
+            backend.salvar(df)
+        esperado = get_backend("pandas")
+        for metodo in ("pivot_instituicao", "calc_general_stats"):
+            pd.testing.assert_frame_equal(
+                getattr(backend, metodo)(df),
+                getattr(esperado, metodo)(df),
+                check_dtype=False,
+                rtol=rtol,
+            )
+    return _comparar
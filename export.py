@@ -0,0 +1,195 @@
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# ========= EXPORTAÇÃO EM STREAMING =========
+# Os arquivos são gravados em pedaços (chunks) num arquivo temporário, numa
+# thread separada, para não travar os reruns nem duplicar o DataFrame na memória.
+
+CHUNK_ROWS = 50_000
+# arquivos mais velhos que isso são de sessões abandonadas e podem ser apagados
+MAX_IDADE_SEGUNDOS = 60 * 60
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "financas_export")
+EXCEL_MAX_ROWS = 1_048_576
+
+FORMATOS = {
+    "CSV": ".csv",
+    "Parquet": ".parquet",
+    "XLSX": ".xlsx",
+}
+MIME_TYPES = {
+    "CSV": "text/csv",
+    "Parquet": "application/vnd.apache.parquet",
+    "XLSX": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# executor compartilhado pelas sessões do servidor
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="export")
+
+
+def _iter_chunks(df, incluir_indice, tamanho=None):
+    tamanho = tamanho or CHUNK_ROWS
+    # um DataFrame vazio ainda gera um pedaço vazio, para gravar cabeçalho/schema
+    for inicio in range(0, max(len(df), 1), tamanho):
+        chunk = df.iloc[inicio:inicio + tamanho]
+        # reset_index copia só o pedaço, nunca o DataFrame inteiro
+        yield chunk.reset_index() if incluir_indice else chunk
+
+
+def _labels(colunas, column_config):
+    # renomeia as colunas com o "label" do column_config do Streamlit
+    labels = []
+    for col in colunas:
+        cfg = column_config.get(col) or {}
+        labels.append(cfg.get("label") or str(col))
+    return labels
+
+
+def _formato_excel(fmt):
+    # converte o format do st.column_config.NumberColumn para number_format do Excel
+    if not fmt:
+        return None
+    if fmt == "percent":
+        return "0.00%"
+    if fmt == "dollar":
+        return '"$"#,##0.00'
+    if fmt == "euro":
+        return '"€"#,##0.00'
+    m = re.fullmatch(r"(.*?)%\.(\d+)f(.*)", fmt)
+    if m is None:
+        return None
+    prefixo, casas, sufixo = m.groups()
+    numero = "#,##0" + ("." + "0" * int(casas) if int(casas) else "")
+    prefixo = f'"{prefixo}"' if prefixo else ""
+    sufixo = f'"{sufixo}"' if sufixo else ""
+    return prefixo + numero + sufixo
+
+
+def _write_csv(df, path, column_config, incluir_indice):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i, chunk in enumerate(_iter_chunks(df, incluir_indice)):
+            chunk.to_csv(f, index=False, header=_labels(chunk.columns, column_config) if i == 0 else False)
+
+
+def _write_parquet(df, path, column_config, incluir_indice):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    schema = None
+    try:
+        for chunk in _iter_chunks(df, incluir_indice):
+            chunk = chunk.set_axis(_labels(chunk.columns, column_config), axis=1)
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                schema = table.schema
+                writer = pq.ParquetWriter(path, schema)
+            else:
+                # mesmo schema do primeiro pedaço (evita colunas "null" em chunks vazios)
+                table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_xlsx(df, path, column_config, incluir_indice):
+    import xlsxwriter
+
+    if len(df) + 1 > EXCEL_MAX_ROWS:
+        raise ValueError(f"O Excel suporta no máximo {EXCEL_MAX_ROWS - 1} linhas; use CSV ou Parquet.")
+
+    # constant_memory grava cada linha no disco assim que a próxima começa
+    workbook = xlsxwriter.Workbook(path, {
+        "constant_memory": True,
+        "default_date_format": "dd/mm/yyyy",
+    })
+    try:
+        worksheet = workbook.add_worksheet("Dados")
+        linha = 0
+        formatos = []
+        for chunk in _iter_chunks(df, incluir_indice):
+            if linha == 0:
+                header = workbook.add_format({"bold": True})
+                worksheet.write_row(0, 0, _labels(chunk.columns, column_config), header)
+                for col in chunk.columns:
+                    cfg = column_config.get(col) or {}
+                    num_fmt = _formato_excel((cfg.get("type_config") or {}).get("format"))
+                    formatos.append(workbook.add_format({"num_format": num_fmt}) if num_fmt else None)
+                linha = 1
+            # object + None: tipos nativos do Python; NaN e ±inf viram célula vazia
+            # (o xlsxwriter não grava inf)
+            chunk = chunk.replace([float("inf"), float("-inf")], float("nan"))
+            valores = chunk.astype(object).where(chunk.notna(), None)
+            for registro in valores.itertuples(index=False, name=None):
+                for c, valor in enumerate(registro):
+                    if valor is None:
+                        continue
+                    worksheet.write(linha, c, valor, formatos[c])
+                linha += 1
+    finally:
+        workbook.close()
+
+
+_WRITERS = {
+    "CSV": _write_csv,
+    "Parquet": _write_parquet,
+    "XLSX": _write_xlsx,
+}
+
+
+def _exportar(df, formato, path, column_config, incluir_indice):
+    try:
+        _WRITERS[formato](df, path, column_config, incluir_indice)
+    except Exception:
+        descartar_exportacao(path)
+        raise
+    return path
+
+
+def iniciar_exportacao(df: pd.DataFrame, formato: str, column_config=None, incluir_indice=True):
+    """Agenda a exportação de `df` em background e devolve um Future com o caminho do arquivo."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato não suportado: {formato}")
+    limpar_exportacoes_antigas()
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="financas_", suffix=FORMATOS[formato], dir=EXPORT_DIR)
+    os.close(fd)
+    return _executor.submit(_exportar, df, formato, path, column_config or {}, incluir_indice)
+
+
+def descartar_exportacao(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _descartar_resultado(future):
+    if not future.cancelled() and future.exception() is None:
+        descartar_exportacao(future.result())
+
+
+def descartar_future(future):
+    # apaga o arquivo da exportação assim que ela terminar (na hora, se já terminou)
+    future.add_done_callback(_descartar_resultado)
+
+
+def limpar_exportacoes_antigas(max_idade=MAX_IDADE_SEGUNDOS):
+    # sessões encerradas não avisam; apaga os arquivos esquecidos pelo tempo de vida
+    limite = time.time() - max_idade
+    try:
+        nomes = os.listdir(EXPORT_DIR)
+    except FileNotFoundError:
+        return
+    for nome in nomes:
+        path = os.path.join(EXPORT_DIR, nome)
+        try:
+            if os.path.getmtime(path) < limite:
+                os.remove(path)
+        except OSError:
+            pass
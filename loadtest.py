@@ -0,0 +1,364 @@
+"""Teste de carga: N sessões simultâneas de auth.py + finance_app num servidor real.
+
+Sobe `streamlit run auth.py` localmente (um ou mais processos/réplicas) e cada
+sessão simulada conversa com ele pelo mesmo websocket do navegador
+(/_stcore/stream): faz login, envia o CSV pelo endpoint de upload e altera os
+inputs de Metas várias vezes. O banco é um SQLite local, passado pela mesma
+variável ENGINE_URL usada em db.py.
+
+As latências são medidas no cliente, do envio do rerun até o script_finished:
+incluem execução do script, serialização protobuf e o caminho Tornado/websocket.
+Conexões com o banco e memória são amostradas no processo de cada servidor.
+
+uso: python loadtest.py --sessoes 1,5,10,20 --servidores 1 --reruns 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SENHA = "senha-loadtest"
+PORTA_INICIAL = 8600
+
+
+def gerar_csv(path, meses=36, instituicoes=("Nubank", "Itaú", "XP", "Inter")):
+    # CSV sintético no mesmo formato do upload (Data dd/mm/aaaa, Instituição, Valor)
+    import pandas as pd
+
+    datas = pd.date_range("2020-01-01", periods=meses, freq="MS")
+    linhas = [
+        {"Data": d.strftime("%d/%m/%Y"), "Instituição": inst, "Valor": round(random.uniform(1_000, 50_000), 2)}
+        for d in datas
+        for inst in instituicoes
+    ]
+    pd.DataFrame(linhas).to_csv(path, index=False)
+
+
+def semear_usuarios(n):
+    import bcrypt
+    from db import ensure_users_table, upsert_user_to_db
+
+    ensure_users_table()
+    # um único hash: o bcrypt é lento de propósito
+    password_hash = bcrypt.hashpw(SENHA.encode(), bcrypt.gensalt()).decode()
+    for i in range(n):
+        upsert_user_to_db(f"loadtest_{i}", f"loadtest_{i}@example.com", "Load", str(i), password_hash)
+
+
+def _percentis(valores):
+    if not valores:
+        return (float("nan"),) * 3
+    if len(valores) == 1:
+        return (valores[0],) * 3
+    q = statistics.quantiles(valores, n=100, method="inclusive")
+    return q[49], q[94], q[98]
+
+
+# ========= SERVIDOR =========
+def _servir(porta, com_selic):
+    # roda no processo do servidor (python loadtest.py --servidor PORTA)
+    if not com_selic:
+        import requests
+
+        # não bater na API do BCB a cada rerun de cada sessão
+        class _RespostaSelic:
+            def json(self):
+                return {"conteudo": []}
+
+        requests.get = lambda *args, **kwargs: _RespostaSelic()
+
+    from streamlit.web import cli
+
+    sys.argv = [
+        "streamlit", "run", os.path.join(ROOT, "auth.py"),
+        "--server.port", str(porta),
+        "--server.headless", "true",
+        "--server.enableXsrfProtection", "false",
+        "--browser.gatherUsageStats", "false",
+    ]
+    sys.exit(cli.main())
+
+
+def _subir_servidor(porta, com_selic, log):
+    processo = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--servidor", str(porta)] + (["--com-selic"] if com_selic else []),
+        stdout=log, stderr=subprocess.STDOUT, env=os.environ.copy(),
+    )
+    import urllib.request
+
+    limite = time.time() + 60
+    while time.time() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"servidor na porta {porta} terminou (veja {log.name})")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{porta}/_stcore/health", timeout=1):
+                return processo
+        except OSError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError(f"servidor na porta {porta} não respondeu")
+
+
+class Monitor(threading.Thread):
+    # amostra memória (RSS) e conexões abertas com o banco no processo do servidor
+
+    def __init__(self, pid, engine_url):
+        super().__init__(daemon=True)
+        import psutil
+        from sqlalchemy.engine import make_url
+
+        self._processo = psutil.Process(pid)
+        url = make_url(engine_url)
+        self._sqlite = os.path.abspath(url.database) if url.get_backend_name() == "sqlite" else None
+        self._porta_db = url.port or 5432
+        self._parar = threading.Event()
+        self.memoria_pico = 0
+        self.conexoes_pico = 0
+
+    def _conexoes(self):
+        if self._sqlite:
+            # cada conexão SQLite mantém o arquivo do banco aberto
+            return sum(1 for f in self._processo.open_files() if f.path == self._sqlite)
+        return sum(1 for c in self._processo.net_connections(kind="tcp") if c.raddr and c.raddr.port == self._porta_db)
+
+    def run(self):
+        while not self._parar.wait(0.1):
+            try:
+                self.memoria_pico = max(self.memoria_pico, self._processo.memory_info().rss)
+                self.conexoes_pico = max(self.conexoes_pico, self._conexoes())
+            except Exception:
+                return
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+# ========= SESSÃO (CLIENTE WEBSOCKET) =========
+class Sessao:
+    # fala o protocolo do frontend: BackMsg/ForwardMsg em protobuf pelo websocket
+
+    def __init__(self, porta, timeout):
+        self.base = f"127.0.0.1:{porta}"
+        self.timeout = timeout
+        self.session_id = None
+        self.widgets = {}    # estado de cada widget, reenviado em todo rerun (como o navegador faz)
+        self.elementos = []  # elementos do último rerun: (tipo, proto)
+
+    async def conectar(self):
+        from tornado.websocket import websocket_connect
+
+        self.ws = await websocket_connect(f"ws://{self.base}/_stcore/stream", subprotocols=["streamlit"])
+
+    def fechar(self):
+        self.ws.close()
+
+    async def _receber(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        dados = await asyncio.wait_for(self.ws.read_message(), self.timeout)
+        if dados is None:
+            raise RuntimeError("websocket fechado pelo servidor")
+        msg = ForwardMsg()
+        msg.ParseFromString(dados)
+        return msg
+
+    async def rerun(self, trigger=None):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        back = BackMsg()
+        back.rerun_script.query_string = ""
+        back.rerun_script.widget_states.widgets.extend(self.widgets.values())
+        if trigger is not None:
+            back.rerun_script.widget_states.widgets.add(id=trigger, trigger_value=True)
+
+        inicio = time.perf_counter()
+        await self.ws.write_message(back.SerializeToString(), binary=True)
+        self.elementos = []
+        while True:
+            msg = await self._receber()
+            tipo = msg.WhichOneof("type")
+            if tipo == "new_session":
+                if msg.new_session.initialize.session_id:
+                    self.session_id = msg.new_session.initialize.session_id
+                # st.rerun() recomeça o script: só vale o último rerun
+                self.elementos = []
+            elif tipo == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                el = msg.delta.new_element
+                tipo_el = el.WhichOneof("type")
+                self.elementos.append((tipo_el, getattr(el, tipo_el)))
+            elif tipo == "script_finished" and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        erros = [e.message for t, e in self.elementos if t == "exception"]
+        if erros:
+            raise RuntimeError(erros[0])
+        return time.perf_counter() - inicio
+
+    def widget(self, tipo, label, form_id=None):
+        for t, el in self.elementos:
+            if t == tipo and el.label == label and (form_id is None or el.form_id == form_id):
+                return el
+        raise LookupError(f"{tipo} '{label}' não encontrado")
+
+    def definir(self, widget_id, **valor):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        self.widgets[widget_id] = WidgetState(id=widget_id, **valor)
+
+    async def upload(self, uploader, nome, dados):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        from tornado.httpclient import AsyncHTTPClient
+
+        # 1) pede as URLs de upload ao servidor
+        back = BackMsg()
+        back.file_urls_request.request_id = uuid.uuid4().hex
+        back.file_urls_request.file_names.append(nome)
+        back.file_urls_request.session_id = self.session_id
+        await self.ws.write_message(back.SerializeToString(), binary=True)
+        while True:
+            msg = await self._receber()
+            if msg.WhichOneof("type") == "file_urls_response":
+                urls = msg.file_urls_response.file_urls[0]
+                break
+
+        # 2) envia o arquivo (multipart, como o frontend)
+        boundary = uuid.uuid4().hex
+        corpo = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{nome}\"\r\n"
+            f"Content-Type: text/csv\r\n\r\n"
+        ).encode() + dados + f"\r\n--{boundary}--\r\n".encode()
+        await AsyncHTTPClient().fetch(
+            f"http://{self.base}{urls.upload_url}", method="PUT", body=corpo,
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+
+        # 3) o widget passa a apontar para o arquivo enviado
+        estado = WidgetState(id=uploader.id)
+        info = estado.file_uploader_state_value.uploaded_file_info.add()
+        info.file_id = urls.file_id
+        info.name = nome
+        info.size = len(dados)
+        info.file_urls.CopyFrom(urls)
+        self.widgets[uploader.id] = estado
+
+
+async def _sessao(i, porta, dados_csv, reruns, timeout, resultado):
+    sessao = Sessao(porta, timeout)
+    await sessao.conectar()
+    try:
+        await sessao.rerun()
+
+        # login: os campos do formulário do botão "Entrar" (o cadastro também tem Usuário/Senha)
+        entrar = sessao.widget("button", "Entrar")
+        sessao.definir(sessao.widget("text_input", "Usuário", entrar.form_id).id, string_value=f"loadtest_{i}")
+        sessao.definir(sessao.widget("text_input", "Senha", entrar.form_id).id, string_value=SENHA)
+        resultado["login"].append(await sessao.rerun(trigger=entrar.id))
+
+        await sessao.upload(sessao.widget("file_uploader", "Carregue seu arquivo CSV"), "transacoes.csv", dados_csv)
+        resultado["upload"].append(await sessao.rerun())
+
+        # salário sempre acima dos custos: "Meta Estipulada" não aceita valor negativo
+        sessao.definir(sessao.widget("number_input", "Salário Líquido").id, double_value=10_000.0)
+        for _ in range(reruns):
+            label, minimo, maximo = random.choice([
+                ("Custos Fixos", 0, 5_000), ("Salário Líquido", 5_000, 20_000), ("Salário Bruto", 5_000, 30_000),
+            ])
+            sessao.definir(sessao.widget("number_input", label).id, double_value=round(random.uniform(minimo, maximo), 2))
+            resultado["rerun"].append(await sessao.rerun())
+    finally:
+        sessao.fechar()
+
+
+async def _executar_sessoes(n, portas, dados_csv, reruns, timeout):
+    resultado = {"login": [], "upload": [], "rerun": [], "erros": []}
+
+    async def _uma(i):
+        try:
+            await _sessao(i, portas[i % len(portas)], dados_csv, reruns, timeout, resultado)
+        except Exception as e:
+            resultado["erros"].append(f"loadtest_{i}: {type(e).__name__}: {e}")
+
+    await asyncio.gather(*(_uma(i) for i in range(n)))
+    return resultado
+
+
+def executar_nivel(n, servidores, reruns, timeout, dados_csv, com_selic, log):
+    # servidores novos a cada nível: memória e conexões não herdam sessões anteriores
+    portas = [PORTA_INICIAL + p for p in range(servidores)]
+    processos = []
+    monitores = []
+    try:
+        for porta in portas:
+            processos.append(_subir_servidor(porta, com_selic, log))
+        for processo in processos:
+            monitores.append(Monitor(processo.pid, os.environ["ENGINE_URL"]))
+            monitores[-1].start()
+        resultado = asyncio.run(_executar_sessoes(n, portas, dados_csv, reruns, timeout))
+    finally:
+        for monitor in monitores:
+            monitor.parar()
+        for processo in processos:
+            processo.terminate()
+            processo.wait()
+    resultado["conexoes"] = [m.conexoes_pico for m in monitores]
+    resultado["memoria_mb"] = [m.memoria_pico / 1024 ** 2 for m in monitores]
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessoes", default="1,5,10,20", help="níveis de sessões simultâneas, separados por vírgula")
+    parser.add_argument("--servidores", type=int, default=1, help="processos (réplicas) do servidor que dividem as sessões")
+    parser.add_argument("--reruns", type=int, default=10, help="alterações de Metas por sessão")
+    parser.add_argument("--timeout", type=float, default=60, help="timeout de cada rerun (s)")
+    parser.add_argument("--csv", help="CSV a carregar (padrão: gera um sintético)")
+    parser.add_argument("--engine-url", help="banco a usar (padrão: SQLite temporário)")
+    parser.add_argument("--com-selic", action="store_true", help="consulta a API real da Selic a cada rerun")
+    parser.add_argument("--servidor", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.servidor:
+        _servir(args.servidor, args.com_selic)
+
+    niveis = [int(n) for n in args.sessoes.split(",")]
+    tmp = tempfile.mkdtemp(prefix="loadtest_")
+    # precisa estar no ambiente antes de importar db (aqui e nos servidores)
+    os.environ["ENGINE_URL"] = args.engine_url or f"sqlite:///{os.path.join(tmp, 'loadtest.db')}"
+    csv_path = args.csv or os.path.join(tmp, "transacoes.csv")
+    if not args.csv:
+        gerar_csv(csv_path)
+    with open(csv_path, "rb") as f:
+        dados_csv = f.read()
+
+    sys.path.insert(0, ROOT)
+    semear_usuarios(max(niveis))
+
+    print(f"banco: {os.environ['ENGINE_URL']}  |  log dos servidores: {os.path.join(tmp, 'servidor.log')}")
+    print("latências medidas no cliente (websocket): rerun -> script_finished")
+    print(f"{'N':>4} | {'rerun p50/p95/p99 (ms)':>24} | {'login p50/p95/p99 (ms)':>24} | "
+          f"{'upload p50 (ms)':>15} | {'conexões BD (pico)':>18} | {'memória/servidor (MB)':>21} | erros")
+    with open(os.path.join(tmp, "servidor.log"), "w") as log:
+        for n in niveis:
+            r = executar_nivel(n, args.servidores, args.reruns, args.timeout, dados_csv, args.com_selic, log)
+            rerun = "/".join(f"{v * 1000:.0f}" for v in _percentis(r["rerun"]))
+            login = "/".join(f"{v * 1000:.0f}" for v in _percentis(r["login"]))
+            upload = f"{_percentis(r['upload'])[0] * 1000:.0f}"
+            conexoes = "/".join(str(c) for c in r["conexoes"])
+            memoria = "/".join(f"{m:.0f}" for m in r["memoria_mb"])
+            print(f"{n:>4} | {rerun:>24} | {login:>24} | {upload:>15} | {conexoes:>18} | {memoria:>21} | {len(r['erros'])}")
+            for erro in r["erros"][:5]:
+                print(f"       ! {erro}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 # %%
 import streamlit as st
 import pandas as pd
+import hashlib
+import os
 import requests
+from backends import get_backend
+from export import FORMATOS, MIME_TYPES, iniciar_exportacao, descartar_future
+from memo import Memo
 def finance_app():
 
 # %%
@@ -13,24 +18,40 @@ def finance_app():
 
 # %%
   get_selic()
-# %%
-  def calc_general_stats(df):
-    df_data = df.groupby(by="Data")[["Valor"]].sum()
-    df_data["lag_1"] = df_data["Valor"].shift(1)
-    df_data["Diferença Mensal"] = df_data["Valor"] - df_data["lag_1"]
-
-    df_data["Avg 6M Diferença"] = df_data["Diferença Mensal"].rolling(6).mean()
-    df_data["Avg 12M Diferença"] = df_data["Diferença Mensal"].rolling(12).mean()
-    df_data["Avg 24M Diferença"] = df_data["Diferença Mensal"].rolling(24).mean()
-
-    df_data["Diferença Mensal Rel."] = df_data["Valor"] / df_data["lag_1"] - 1
-    df_data["Evolução 6M Relativa"] = df_data["Valor"].rolling(6).apply(lambda x: x[-1] / x[0] - 1)
-    df_data["Evolução 12M Relativa"] = df_data["Valor"].rolling(12).apply(lambda x: x[-1] / x[0] - 1)
-    df_data["Evolução 24M Relativa"] = df_data["Valor"].rolling(24).apply(lambda x: x[-1] / x[0] - 1)
 
-    df_data = df_data.drop(columns=["lag_1"])
-
-    return df_data
+  def concluir_exportacao():
+    # chamado no clique do download: libera a sessão e apaga o arquivo temporário
+    exportacao = st.session_state.pop("exportacao", None)
+    if exportacao is not None:
+      descartar_future(exportacao["future"])
+
+  def mostrar_exportacao(aguardando):
+    exportacao = st.session_state.get("exportacao")
+    if exportacao is None:
+      return
+    future = exportacao["future"]
+    if not future.done():
+      st.info(f"Gerando {exportacao['tabela']} ({exportacao['formato']})...")
+    elif aguardando:
+      # terminou: roda a página inteira para parar o polling e mostrar o download
+      st.rerun()
+    elif future.exception() is not None:
+      st.error(f"Falha na exportação: {future.exception()}")
+      del st.session_state["exportacao"]
+    elif not os.path.exists(future.result()):
+      st.warning("O arquivo exportado expirou; gere novamente.")
+      del st.session_state["exportacao"]
+    else:
+      # o download fica visível até ser clicado ou substituído por outra exportação
+      with open(future.result(), "rb") as f:
+        st.download_button(
+            f"Baixar {exportacao['tabela']} ({exportacao['formato']})",
+            data=f,
+            file_name=exportacao["tabela"].lower().replace(" ", "_") + FORMATOS[exportacao["formato"]],
+            mime=MIME_TYPES[exportacao["formato"]],
+            on_click=concluir_exportacao,
+        )
+# %%
   # editando nome do título e ícone da página
   st.set_page_config(page_title="Finanças", page_icon=":sparkles:")
 
@@ -42,11 +63,21 @@ def finance_app():
 
   # widget de upload de arquivo
   file_upload = st.file_uploader("Carregue seu arquivo CSV", type=["csv"])
+  # sem arquivo carregado, os resultados do upload anterior não precisam ficar em memória
+  if file_upload is None:
+    st.session_state.pop("memo", None)
   # Verifica se um arquivo foi carregado
   if file_upload is not None:
+      # cada resultado derivado declara suas entradas e só é recalculado quando elas mudam
+      dataset = hashlib.sha1(file_upload.getvalue()).hexdigest()
+      memo = Memo(escopo=dataset)
+
       # Lê o arquivo CSV
-      df = pd.read_csv(file_upload)
-      df["Data"] = pd.to_datetime(df["Data"], format="%d/%m/%Y").dt.date
+      def ler_csv():
+        df = pd.read_csv(file_upload)
+        df["Data"] = pd.to_datetime(df["Data"], format="%d/%m/%Y").dt.date
+        return df
+      df = memo.no("df", ler_csv, dataset=dataset)
       # Exibe o DataFrame
       exp1 = st.expander("Dados Brutos")
       # Formata a coluna "Valor" para exibição monetária
@@ -55,7 +86,19 @@ def finance_app():
 
       # Pivot table para visualizar os dados por Instituição
       exp2 = st.expander("Instituições")
-      df_instituicao = df.pivot_table(index = "Data", columns = "Instituição", values = "Valor")
+      username = st.session_state.get("username")
+      backend = get_backend(username=username)
+      # no modo postgres o upload é salvo no banco uma vez por usuário e conteúdo de arquivo
+      # (outro usuário pode logar na mesma sessão e carregar o mesmo arquivo)
+      if backend.nome == "postgres" and st.session_state.get("upload_salvo") != (username, dataset):
+        backend.salvar(df)
+        st.session_state["upload_salvo"] = (username, dataset)
+      # no modo postgres o resultado também depende do usuário e do que está salvo no banco
+      versao_dados = backend.versao() if backend.nome == "postgres" else None
+      df_instituicao = memo.no(
+          "pivot", lambda: backend.pivot_instituicao(df),
+          df=memo.versao("df"), backend=backend.nome, username=username, versao_dados=versao_dados,
+      )
 
       # Abas para visualizar os dados
       tab_data, tab_history, tab_share = exp2.tabs(["Dados", "Histórico", "Distribuição"])
@@ -78,10 +121,15 @@ def finance_app():
         # Obter a última data do DataFrame
         if date not in df_instituicao.index:
           st.warning("Selecione uma data válida.")
-        st.bar_chart(df_instituicao.loc[date])
+        else:
+          distribuicao = memo.no("distribuicao", lambda: df_instituicao.loc[date], pivot=memo.versao("pivot"), date=date)
+          st.bar_chart(distribuicao)
 
       exp3 = st.expander("Estatísticas Gerais")
-      df_stats = calc_general_stats(df)
+      df_stats = memo.no(
+          "stats", lambda: backend.calc_general_stats(df),
+          df=memo.versao("df"), backend=backend.nome, username=username, versao_dados=versao_dados,
+      )
 
       columns_config = {
           "Valor": st.column_config.NumberColumn("Valor", format="R$ %.2f", help="Valor total por Data"),
@@ -113,27 +161,57 @@ def finance_app():
               "Evolução 24M Relativa",
           ]
           st.line_chart(data=df_stats[rel_cols])
+
+      with st.expander("Exportar"):
+        # tabela -> (DataFrame, column_config, exporta o índice?)
+        tabelas = {
+            "Estatísticas Gerais": (df_stats, columns_config, True),
+            "Instituições": (df_instituicao, {}, True),
+            "Dados Brutos": (df, columns_fmt, False),
+        }
+        col1_exp, col2_exp = st.columns(2)
+        tabela = col1_exp.selectbox("Tabela", list(tabelas))
+        formato = col2_exp.selectbox("Formato", list(FORMATOS))
+
+        # uma exportação por sessão; o arquivo anterior é descartado ao gerar outro
+        if st.button("Gerar arquivo"):
+          anterior = st.session_state.get("exportacao")
+          if anterior is not None:
+            descartar_future(anterior["future"])
+          dados, cfg, incluir_indice = tabelas[tabela]
+          st.session_state["exportacao"] = {
+              "tabela": tabela,
+              "formato": formato,
+              "future": iniciar_exportacao(dados, formato, cfg, incluir_indice),
+          }
+
+        exportacao = st.session_state.get("exportacao")
+        if exportacao is not None:
+          # enquanto o arquivo é gerado só este trecho roda de novo, a cada segundo
+          aguardando = not exportacao["future"].done()
+          st.fragment(mostrar_exportacao, run_every=1 if aguardando else None)(aguardando)
       
       with st.expander("Metas"):
         col1, col2 = st.columns(2)
 
         data_inicio_meta = col1.date_input("Início da Meta", max_value=df_stats.index.max())
 
-        data_filtrada = df_stats.index[df_stats.index <= data_inicio_meta][-1]
-
         custos_fixos = col1.number_input("Custos Fixos", min_value=0., format="%.2f", help="Valor dos custos fixos mensais")
         salario_bruto = col2.number_input("Salário Bruto", min_value=0., format="%.2f")
         salario_liquido = col2.number_input("Salário Líquido", min_value=0., format="%.2f")
 
-        valor_inicio = df_stats.loc[data_filtrada]["Valor"]
+        def calc_valor_inicio():
+          data_filtrada = df_stats.index[df_stats.index <= data_inicio_meta][-1]
+          return df_stats.loc[data_filtrada]["Valor"]
+        valor_inicio = memo.no("valor_inicio", calc_valor_inicio, stats=memo.versao("stats"), data_inicio_meta=data_inicio_meta)
         col1.markdown(f"**Patrimônio Inicial**: R$ {valor_inicio:.2f}")
 
         selic = st.number_input("Taxa Selic Anual (%)", min_value=0., format="%.2f", value=15.00)
         selic = selic / 100
 
         col1_pot, col2_pot = st.columns(2)
-        mensal = salario_liquido - custos_fixos
-        anual = mensal * 12
+        mensal = memo.no("mensal", lambda: salario_liquido - custos_fixos, salario_liquido=salario_liquido, custos_fixos=custos_fixos)
+        anual = memo.no("anual", lambda: mensal * 12, mensal=memo.versao("mensal"))
 
         with col1_pot.container(border=True):
           st.markdown(f"**Potencial Arredação Mensal**: \n \n R$ {mensal:.2f}")
@@ -149,5 +227,13 @@ def finance_app():
           with col1_meta:
             meta_estipulada = st.number_input("Meta Estipulada", min_value=0., format="%.2f", value = anual)
           with col2_meta:
-            patrimonio_final = valor_inicio + meta_estipulada
+            patrimonio_final = memo.no(
+                "patrimonio_final", lambda: valor_inicio + meta_estipulada,
+                valor_inicio=memo.versao("valor_inicio"), meta_estipulada=meta_estipulada,
+            )
             st.markdown(f"**Patrimônio Final Estimado Pós Meta**: \n \n R$ {patrimonio_final:.2f}")
+
+      # painel de debug: quais nós rodaram neste rerun (FINANCE_DEBUG=1)
+      if os.environ.get("FINANCE_DEBUG") == "1":
+        with st.expander("Debug: recálculos"):
+          memo.mostrar_debug()
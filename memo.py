@@ -0,0 +1,52 @@
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+# ========= MEMOIZAÇÃO POR DEPENDÊNCIAS =========
+# Cada resultado derivado (nó) declara as entradas de que depende e só é
+# recalculado quando alguma delas muda. Um nó pode depender de outro usando
+# memo.versao("nome") como entrada. O cache é por sessão e limitado (LRU).
+# O `escopo` (ex.: hash do upload) descarta tudo quando muda, para que os
+# DataFrames do upload anterior não fiquem presos no cache.
+
+
+class Memo:
+    def __init__(self, chave="memo", max_entradas=16, escopo=None):
+        estado = st.session_state.setdefault(chave, {"escopo": escopo, "cache": OrderedDict()})
+        if estado["escopo"] != escopo:
+            estado["cache"].clear()
+            estado["escopo"] = escopo
+        self._cache = estado["cache"]
+        self._versoes = {}
+        self.max_entradas = max_entradas
+        # nós avaliados neste rerun, para o painel de debug
+        self.execucoes = []
+
+    def no(self, nome, funcao, **entradas):
+        # as entradas precisam ser "hashable" (str, números, datas, versões de outros nós)
+        chave = (nome, tuple(sorted(entradas.items())))
+        inicio = time.perf_counter()
+        recalculou = chave not in self._cache
+        if recalculou:
+            self._cache[chave] = funcao()
+            while len(self._cache) > self.max_entradas:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(chave)
+        self._versoes[nome] = chave
+        self.execucoes.append({
+            "nó": nome,
+            "recalculou": recalculou,
+            "tempo (ms)": (time.perf_counter() - inicio) * 1000,
+            "entradas": ", ".join(entradas),
+        })
+        return self._cache[chave]
+
+    def versao(self, nome):
+        return self._versoes[nome]
+
+    def mostrar_debug(self, container=st):
+        container.dataframe(pd.DataFrame(self.execucoes), hide_index=True)
+        container.caption(f"{len(self._cache)}/{self.max_entradas} resultados em cache nesta sessão")
@@ -0,0 +1,48 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backends import get_backend
+
+# cada teste roda contra o DuckDB e o Postgres (fixture `backend` do conftest)
+
+
+@pytest.mark.parametrize("n_datas", [1, 5, 6, 11, 12, 23, 24, 30])
+def test_paridade_janelas(comparar, transacoes, n_datas):
+    # menos datas que as janelas de 6/12/24 meses e exatamente o tamanho delas
+    comparar(transacoes(n_datas))
+
+
+def test_paridade_varias_transacoes_por_instituicao_e_data(comparar, transacoes):
+    df = transacoes(14)
+    df = pd.concat([df, df.assign(Valor=df["Valor"] * 0.5)], ignore_index=True)
+    comparar(df)
+
+
+def test_paridade_valor_nan(comparar, transacoes):
+    df = transacoes(14)
+    df.loc[[0, 7, 20], "Valor"] = np.nan
+    comparar(df)
+
+
+def test_paridade_instituicao_ausente_em_algumas_datas(comparar, transacoes):
+    df = transacoes(26)
+    df = df[~((df["Instituição"] == "XP") & (df["Data"] < datetime.date(2021, 1, 1)))]
+    df = df[~((df["Instituição"] == "Itaú") & (df["Data"] > datetime.date(2021, 6, 1)))]
+    comparar(df)
+
+
+def test_paridade_total_mensal_zero(comparar, transacoes):
+    # total zero gera divisão por zero: inf/NaN no pandas, que os backends devem reproduzir
+    df = transacoes(26, valor=lambda d, i: 0.0 if d in (3, 4, 15) else 500.0 * (d + 1) - 100 * i)
+    stats = get_backend("pandas").calc_general_stats(df)
+    assert np.isinf(stats["Diferença Mensal Rel."]).any()
+    comparar(df)
+
+
+def test_paridade_valor_inteiro(comparar, transacoes):
+    df = transacoes(26, valor=lambda d, i: 100 * (d + 1) + i)
+    assert df["Valor"].dtype.kind == "i"
+    comparar(df)
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import export
+from export import FORMATOS, _formato_excel, iniciar_exportacao
+
+
+@pytest.fixture(autouse=True)
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _exportar(df, formato, column_config=None, incluir_indice=False):
+    return iniciar_exportacao(df, formato, column_config, incluir_indice).result(timeout=30)
+
+
+def _ler(path, formato):
+    if formato == "CSV":
+        return pd.read_csv(path)
+    if formato == "Parquet":
+        return pd.read_parquet(path)
+    pytest.importorskip("openpyxl")
+    return pd.read_excel(path, sheet_name="Dados")
+
+
+def _dados(n):
+    return pd.DataFrame({
+        "Instituição": [f"Banco {i}" for i in range(n)],
+        "Valor": [10.5 * i for i in range(n)],
+        "Qtd": list(range(n)),
+    })
+
+
+@pytest.mark.parametrize("fmt, esperado", [
+    ("R$ %.2f", '"R$ "#,##0.00'),
+    ("%.0f dias", '#,##0" dias"'),
+    ("%.3f", "#,##0.000"),
+    ("percent", "0.00%"),
+    ("dollar", '"$"#,##0.00'),
+    ("euro", '"€"#,##0.00'),
+    ("compact", None),
+    ("%d", None),
+    (None, None),
+])
+def test_formato_excel(fmt, esperado):
+    assert _formato_excel(fmt) == esperado
+
+
+@pytest.mark.parametrize("formato", list(FORMATOS))
+def test_labels_do_column_config(formato):
+    cfg = {"Valor": {"label": "Valor (R$)", "type_config": {"format": "R$ %.2f"}}, "Qtd": {}}
+    lido = _ler(_exportar(_dados(3), formato, cfg), formato)
+    assert list(lido.columns) == ["Instituição", "Valor (R$)", "Qtd"]
+
+
+@pytest.mark.parametrize("formato", list(FORMATOS))
+def test_indice_exportado(formato):
+    df = _dados(3).set_index("Instituição")
+    lido = _ler(_exportar(df, formato, incluir_indice=True), formato)
+    assert list(lido["Instituição"]) == ["Banco 0", "Banco 1", "Banco 2"]
+
+
+@pytest.mark.parametrize("formato", list(FORMATOS))
+def test_varios_chunks(formato, monkeypatch):
+    # 10 linhas em pedaços de 3: o último pedaço fica incompleto
+    monkeypatch.setattr(export, "CHUNK_ROWS", 3)
+    df = _dados(10)
+    pd.testing.assert_frame_equal(_ler(_exportar(df, formato), formato), df, check_dtype=False)
+
+
+@pytest.mark.parametrize("formato", list(FORMATOS))
+def test_dataframe_vazio(formato):
+    cfg = {"Valor": {"label": "Valor (R$)"}}
+    path = _exportar(_dados(0), formato, cfg)
+    lido = _ler(path, formato)
+    assert lido.empty
+    assert list(lido.columns) == ["Instituição", "Valor (R$)", "Qtd"]
+
+
+def test_xlsx_inf_e_nan_viram_celula_vazia():
+    df = pd.DataFrame({"Valor": [1.0, np.inf, -np.inf, np.nan, 2.0]})
+    lido = _ler(_exportar(df, "XLSX"), "XLSX")
+    assert lido["Valor"].iloc[[0, 4]].tolist() == [1.0, 2.0]
+    assert lido["Valor"].iloc[1:4].isna().all()
+
+
+def test_xlsx_formato_numerico():
+    openpyxl = pytest.importorskip("openpyxl")
+    cfg = {"Valor": {"type_config": {"format": "percent"}}}
+    sheet = openpyxl.load_workbook(_exportar(_dados(2), "XLSX", cfg))["Dados"]
+    assert sheet["B2"].number_format == "0.00%"
+    assert sheet["C2"].number_format == "General"
+
+
+def test_falha_apaga_arquivo(export_dir, monkeypatch):
+    monkeypatch.setattr(export, "EXCEL_MAX_ROWS", 2)
+    future = iniciar_exportacao(_dados(5), "XLSX")
+    with pytest.raises(ValueError):
+        future.result(timeout=30)
+    assert list(export_dir.iterdir()) == []
+
+
+def test_descartar_future_apaga_arquivo(export_dir):
+    future = iniciar_exportacao(_dados(5), "CSV")
+    future.result(timeout=30)
+    # já terminada: o callback roda na hora
+    export.descartar_future(future)
+    assert list(export_dir.iterdir()) == []
@@ -0,0 +1,145 @@
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import memo
+from memo import Memo
+
+
+@pytest.fixture
+def session_state(monkeypatch):
+    # fora de um `streamlit run` a sessão é só um dict
+    estado = {}
+    monkeypatch.setattr(memo.st, "session_state", estado)
+    return estado
+
+
+def _contador():
+    chamadas = []
+
+    def funcao(valor):
+        chamadas.append(valor)
+        return valor * 2
+    return chamadas, funcao
+
+
+def test_recalcula_so_quando_as_entradas_mudam(session_state):
+    chamadas, dobro = _contador()
+    assert Memo().no("dobro", lambda: dobro(1), x=1) == 2
+    assert Memo().no("dobro", lambda: dobro(1), x=1) == 2
+    assert Memo().no("dobro", lambda: dobro(3), x=3) == 6
+    assert chamadas == [1, 3]
+
+
+def test_dependencia_por_versao(session_state):
+    chamadas, dobro = _contador()
+
+    def rerun(x):
+        m = Memo()
+        base = m.no("base", lambda: x, x=x)
+        m.no("derivado", lambda: dobro(base), base=m.versao("base"))
+        return [e["nó"] for e in m.execucoes if e["recalculou"]]
+
+    assert rerun(1) == ["base", "derivado"]
+    assert rerun(1) == []
+    assert rerun(2) == ["base", "derivado"]
+    # a versão antiga de "base" ainda está em cache, e com ela a de "derivado"
+    assert rerun(1) == []
+    assert chamadas == [1, 2]
+
+
+def test_lru_limita_entradas(session_state):
+    chamadas, dobro = _contador()
+    m = Memo(max_entradas=3)
+    for x in range(5):
+        m.no("dobro", lambda: dobro(x), x=x)
+    assert len(session_state["memo"]["cache"]) == 3
+
+    # a entrada usada por último sobrevive; a mais antiga saiu
+    m.no("dobro", lambda: dobro(2), x=2)
+    m.no("dobro", lambda: dobro(5), x=5)
+    m.no("dobro", lambda: dobro(2), x=2)
+    m.no("dobro", lambda: dobro(3), x=3)
+    assert chamadas == [0, 1, 2, 3, 4, 5, 3]
+    assert len(session_state["memo"]["cache"]) == 3
+
+
+def test_escopo_novo_limpa_o_cache(session_state):
+    chamadas, dobro = _contador()
+    Memo(escopo="upload1").no("dobro", lambda: dobro(1), x=1)
+    Memo(escopo="upload1").no("dobro", lambda: dobro(1), x=1)
+    Memo(escopo="upload2").no("dobro", lambda: dobro(1), x=1)
+    assert chamadas == [1, 1]
+    assert len(session_state["memo"]["cache"]) == 1
+
+
+# ========= APP =========
+
+def _app():
+    import io
+    from unittest import mock
+
+    import streamlit as st
+
+    from main import finance_app
+
+    class _Selic:
+        def json(self):
+            return {"conteudo": []}
+
+    # upload e API da Selic simulados; o CSV vem da sessão do teste
+    upload = io.BytesIO(st.session_state["csv_teste"])
+    with mock.patch("streamlit.file_uploader", return_value=upload), \
+            mock.patch("requests.get", return_value=_Selic()):
+        finance_app()
+
+
+def _csv(df):
+    return df.assign(Data=pd.to_datetime(df["Data"]).dt.strftime("%d/%m/%Y")).to_csv(index=False).encode()
+
+
+@pytest.fixture
+def app(monkeypatch, transacoes):
+    monkeypatch.setattr("backends.DEFAULT_BACKEND", "pandas")
+    at = AppTest.from_function(_app, default_timeout=30)
+    at.session_state["csv_teste"] = _csv(transacoes(30))
+    return at
+
+
+def _rodar(at):
+    # nós recalculados neste rerun = chaves novas no cache da sessão
+    antes = set(at.session_state["memo"]["cache"]) if "memo" in at.session_state else set()
+    at.run()
+    assert not at.exception
+    return {chave[0] for chave in set(at.session_state["memo"]["cache"]) - antes}
+
+
+def _number_input(at, label):
+    return next(w for w in at.number_input if w.label == label)
+
+
+def test_app_metas_recalcula_so_as_metas(app):
+    primeiro = _rodar(app)
+    assert {"df", "pivot", "stats", "valor_inicio", "mensal", "anual", "patrimonio_final"} <= primeiro
+
+    _number_input(app, "Salário Líquido").set_value(9000.0)
+    assert _rodar(app) == {"mensal", "anual", "patrimonio_final"}
+
+    _number_input(app, "Custos Fixos").set_value(1000.0)
+    assert _rodar(app) == {"mensal", "anual", "patrimonio_final"}
+
+    # Selic não entra em nenhum nó
+    _number_input(app, "Taxa Selic Anual (%)").set_value(10.0)
+    assert _rodar(app) == set()
+
+
+def test_app_novo_upload_limpa_o_cache(app, transacoes):
+    primeiro = _rodar(app)
+    _number_input(app, "Salário Líquido").set_value(9000.0)
+    _rodar(app)
+    assert len(app.session_state["memo"]["cache"]) > len(primeiro)
+
+    app.session_state["csv_teste"] = _csv(transacoes(24))
+    _rodar(app)
+    # só os nós do upload novo, uma entrada cada
+    assert sorted(chave[0] for chave in app.session_state["memo"]["cache"]) == sorted(primeiro)
@@ -0,0 +1,96 @@
+import datetime
+import threading
+
+import pandas as pd
+
+from backends import PostgresBackend, get_backend
+
+# a paridade com o pandas fica em test_backends.py; aqui, a gravação e o cache
+# incremental. Todos usam a fixture `usuario`, que pula sem um Postgres de teste.
+
+
+def _linhas_salvas(username):
+    import db
+    from sqlalchemy import text
+
+    with db.engine.begin() as conn:
+        return conn.execute(text("SELECT count(*) FROM transacoes WHERE username=:u"), {"u": username}).scalar()
+
+
+def _confere(username, df):
+    # mesmo resultado que o pandas para o upload atual (inclusive via cache incremental)
+    backend = get_backend("postgres", username=username)
+    esperado = get_backend("pandas")
+    for metodo in ("pivot_instituicao", "calc_general_stats"):
+        pd.testing.assert_frame_equal(getattr(backend, metodo)(df), getattr(esperado, metodo)(df), check_dtype=False)
+
+
+def test_append_incremental(usuario, transacoes):
+    completo = transacoes(30)
+    inicial = completo[completo["Data"] < datetime.date(2021, 9, 1)]
+    backend = get_backend("postgres", username=usuario)
+
+    assert backend.salvar(inicial) == len(inicial)
+    _confere(usuario, inicial)
+
+    # o histórico não mudou: só as datas novas são inseridas e buscadas
+    assert backend.salvar(completo) == len(completo) - len(inicial)
+    assert _linhas_salvas(usuario) == len(completo)
+    _confere(usuario, completo)
+    assert backend.salvar(completo) == 0
+
+
+def test_instituicao_renomeada_reescreve(usuario, transacoes):
+    df = transacoes(26)
+    backend = get_backend("postgres", username=usuario)
+    backend.salvar(df)
+    _confere(usuario, df)
+
+    # mesma contagem e mesma soma, conteúdo diferente
+    editado = df.copy()
+    editado.loc[(editado["Instituição"] == "XP") & (editado["Data"] < datetime.date(2020, 6, 1)), "Instituição"] = "BTG"
+    assert backend.salvar(editado) == len(editado)
+    _confere(usuario, editado)
+
+
+def test_valor_movido_entre_datas_reescreve(usuario, transacoes):
+    df = transacoes(26)
+    backend = get_backend("postgres", username=usuario)
+    backend.salvar(df)
+    _confere(usuario, df)
+
+    editado = df.copy()
+    editado.loc[0, "Valor"] += 500
+    editado.loc[3, "Valor"] -= 500
+    assert backend.salvar(editado) == len(editado)
+    _confere(usuario, editado)
+
+
+def test_uploads_simultaneos_nao_duplicam(usuario, transacoes):
+    completo = transacoes(30)
+    backend = get_backend("postgres", username=usuario)
+    backend.salvar(completo[completo["Data"] < datetime.date(2021, 1, 1)])
+
+    erros = []
+
+    def _salvar():
+        try:
+            get_backend("postgres", username=usuario).salvar(completo)
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=_salvar) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not erros
+    assert _linhas_salvas(usuario) == len(completo)
+    _confere(usuario, completo)
+
+
+def test_cache_compartilhado_por_usuario(usuario, transacoes):
+    df = transacoes(12)
+    get_backend("postgres", username=usuario).salvar(df)
+    get_backend("postgres", username=usuario).calc_general_stats(df)
+    assert (usuario, "stats") in PostgresBackend._cache